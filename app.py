@@ -1,26 +1,56 @@
 # app.py
 from __future__ import annotations
 from crawler import crawl_doctor_site
-import os, re, time, math, json, pathlib
-from typing import Any, Dict, List, Optional, Tuple
+from cache_store import DiskCache, SeenStore
+from rate_limit import TokenBucket
+from names import split_doctor_and_clinic
+import os, io, time, math, json, random, threading
+from email.utils import parsedate_to_datetime
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
-import pandas as pd
 import requests
+import xlsxwriter
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import streamlit as st
+try: import orjson  # optional: faster decoding of the larger detail/review payloads
+except ImportError: orjson = None
 
 # =============== Page setup ===============
 st.set_page_config(page_title="Search Doctors and Clinics in Pune", layout="wide")
 st.title("Search Doctors and Clinics in Pune")
 
 # =============== HTTP session ===============
-SESSION = requests.Session()
-_retries = Retry(total=3, backoff_factor=0.6,
-                 status_forcelist=[429, 500, 502, 503, 504],
-                 allowed_methods=["GET", "POST"], raise_on_status=False)
-adapter = HTTPAdapter(max_retries=_retries, pool_connections=64, pool_maxsize=64)
-SESSION.mount("https://", adapter); SESSION.mount("http://", adapter)
+class JitterRetry(Retry):
+    # full jitter on urllib3's exponential backoff so parallel workers don't retry in lockstep
+    def get_backoff_time(self) -> float:
+        return random.random() * super().get_backoff_time()
+
+# upper bound on concurrent Places calls (PLACES_GATE's ceiling); the pool is sized from it so
+# no worker ever finds it full and drops a keep-alive connection
+PLACES_MAX_INFLIGHT = 32
+
+# kept across Streamlit reruns so pooled keep-alive connections (and their TLS sessions) are reused
+@st.cache_resource(show_spinner=False)
+def build_session() -> requests.Session:
+    s = requests.Session()
+    # 429/503 are left to retry_request, so Retry-After is clamped and PLACES_GATE sees each one
+    _retries = JitterRetry(total=3, backoff_factor=0.6,
+                          status_forcelist=[500, 502, 504],
+                          allowed_methods=["GET", "POST"], raise_on_status=False)
+    adapter = HTTPAdapter(max_retries=_retries, pool_connections=4,
+                          pool_maxsize=PLACES_MAX_INFLIGHT + 2, pool_block=True)
+    s.mount("https://", adapter); s.mount("http://", adapter)
+    # pre-warm: open the first TLS connection to Places before any search is issued
+    try: s.head("https://places.googleapis.com/", timeout=3)
+    except requests.RequestException: pass
+    return s
+
+SESSION = build_session()
 DEFAULT_TIMEOUT = 8
 
 # =============== API key ===============
@@ -44,38 +74,123 @@ if not API_KEY:
 TEXT_URL   = "https://places.googleapis.com/v1/places:searchText"
 DETAIL_URL = "https://places.googleapis.com/v1/places/{place_id}"
 
+# only fields a row is built from: billing and payload size follow the mask, so nothing unused is asked for
 TEXT_FIELDS = ",".join([
-    "places.id","places.displayName","places.formattedAddress","places.types",
+    "places.id","places.displayName","places.formattedAddress",
     "places.rating","places.userRatingCount","places.websiteUri",
     "places.nationalPhoneNumber","places.internationalPhoneNumber",
 ])
 DETAIL_FIELDS_FAST = ",".join([
-    "id","displayName","formattedAddress","types","websiteUri",
+    "displayName","formattedAddress","websiteUri",
     "nationalPhoneNumber","internationalPhoneNumber","rating","userRatingCount",
 ])
 DETAIL_FIELDS_FULL = DETAIL_FIELDS_FAST + ",reviews"
+# same mask plus reviews, so a search page can stand in for the per-place detail calls
+TEXT_FIELDS_FULL = TEXT_FIELDS + ",places.reviews"
+# just enough to dedupe and label, for runs where every place gets its own detail call anyway
+TEXT_FIELDS_IDS = "places.id,places.displayName"
 
 def _headers(mask: str) -> dict:
     return {"Content-Type":"application/json","X-Goog-Api-Key":API_KEY,"X-Goog-FieldMask":mask}
 
+# built once and shared by every request; _headers() is left for ad-hoc masks
+_HEADERS_TEXT = {"ids": _headers(TEXT_FIELDS_IDS), "basic": _headers(TEXT_FIELDS), "full": _headers(TEXT_FIELDS_FULL)}
+_HEADERS_DETAIL_FAST = _headers(DETAIL_FIELDS_FAST)
+_HEADERS_DETAIL_FULL = _headers(DETAIL_FIELDS_FULL)
+
+# =============== Rate-limit state ===============
+# last X-RateLimit-* values seen on any response; calls slow down once the quota runs low
+RATE_STATE: Dict[str, float] = {}
+_RATE_LOCK = threading.Lock()
+
+def _note_rate_limit(r: requests.Response) -> None:
+    rem, lim = r.headers.get("X-RateLimit-Remaining"), r.headers.get("X-RateLimit-Limit")
+    if rem is None or lim is None: return
+    try:
+        reset = float(r.headers.get("X-RateLimit-Reset") or 0)
+        if 0 < reset < 1e9: reset += time.time()  # delta-seconds form
+        with _RATE_LOCK: RATE_STATE.update(remaining=float(rem), limit=float(lim), reset=reset)
+    except ValueError: pass
+
+def _pace() -> None:
+    with _RATE_LOCK:
+        rem, lim, reset = RATE_STATE.get("remaining"), RATE_STATE.get("limit"), RATE_STATE.get("reset", 0.0)
+    if not lim or rem is None or rem >= 0.2 * lim: return
+    wait = (reset - time.time()) / max(rem, 1.0)
+    if wait > 0: time.sleep(min(wait, 5.0))
+
+class AimdGate:
+    """Adaptive cap on in-flight Places calls: halves on 429, grows by one every `window` successes."""
+    def __init__(self, cap: int = 12, floor: int = 2, ceiling: int = PLACES_MAX_INFLIGHT, window: int = 50):
+        self.cap, self.floor, self.ceiling, self.window = cap, floor, ceiling, window
+        self._active = 0; self._ok = 0; self._cond = threading.Condition()
+
+    def __enter__(self) -> "AimdGate":
+        with self._cond:
+            while self._active >= self.cap: self._cond.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        with self._cond:
+            self._active -= 1; self._cond.notify()
+
+    def record(self, status_code: int) -> None:
+        with self._cond:
+            if status_code == 429:
+                self.cap = max(self.floor, self.cap // 2); self._ok = 0
+            elif status_code < 400:
+                self._ok += 1
+                if self._ok >= self.window:
+                    self.cap = min(self.ceiling, self.cap + 1); self._ok = 0; self._cond.notify_all()
+
+PLACES_GATE = AimdGate()
+
+# stays under the Places per-minute quota up front instead of finding it through 429s
+PLACES_QPS = 50
+PLACES_BUCKET = TokenBucket(PLACES_QPS, burst=10)
+
+# failed API responses are buffered here (from any worker thread) and shown once after the run,
+# instead of one st.warning re-render per error
+ERROR_BUFFER: Deque[Tuple[int,str]] = deque(maxlen=20)
+
+def _decode(r: requests.Response) -> dict:
+    return orjson.loads(r.content) if orjson else r.json()
+
 def _post_json(url: str, headers: dict, payload: dict, timeout: int = DEFAULT_TIMEOUT) -> dict:
-    r = SESSION.post(url, headers=headers, json=payload, timeout=timeout)
+    _pace(); PLACES_BUCKET.acquire()
+    # headers already carry Content-Type: application/json, so the body can be pre-encoded
+    body = orjson.dumps(payload) if orjson else json.dumps(payload).encode()
+    with PLACES_GATE: r = SESSION.post(url, headers=headers, data=body, timeout=timeout)
+    PLACES_GATE.record(r.status_code); _note_rate_limit(r)
     if r.status_code >= 400:
-        try: st.warning(r.json())
-        except Exception: st.warning(r.text)
+        ERROR_BUFFER.append((r.status_code, r.text[:500]))
         r.raise_for_status()
-    return r.json()
+    return _decode(r)
 
 def _get_json(url: str, headers: dict, timeout: int = DEFAULT_TIMEOUT) -> dict:
-    r = SESSION.get(url, headers=headers, timeout=timeout)
+    _pace(); PLACES_BUCKET.acquire()
+    with PLACES_GATE: r = SESSION.get(url, headers=headers, timeout=timeout)
+    PLACES_GATE.record(r.status_code); _note_rate_limit(r)
     if r.status_code >= 400:
-        try: st.warning(r.json())
-        except Exception: st.warning(r.text)
+        ERROR_BUFFER.append((r.status_code, r.text[:500]))
         r.raise_for_status()
-    return r.json()
+    return _decode(r)
 
 # =============== Helpers ===============
-def backoff_sleep(attempt: int) -> None: time.sleep(0.9 * (attempt + 1))
+RETRY_AFTER_MAX = 60.0  # a bogus or hostile Retry-After must not park a worker for hours
+
+def retry_after_seconds(resp: Optional[requests.Response]) -> Optional[float]:
+    ra = resp.headers.get("Retry-After") if resp is not None else None
+    if not ra: return None
+    try: return min(max(0.0, float(ra)), RETRY_AFTER_MAX)
+    except ValueError: pass
+    try: return min(max(0.0, parsedate_to_datetime(ra).timestamp() - time.time()), RETRY_AFTER_MAX)
+    except Exception: return None
+
+def backoff_sleep(attempt: int, retry_after: Optional[float] = None) -> None:
+    if retry_after is not None: time.sleep(retry_after + 0.2 * random.random() * retry_after)
+    else: time.sleep(random.random() * min(0.25 * (2 ** attempt), 15.0))  # full jitter
 
 def retry_request(fn, *args, **kwargs):
     tries = kwargs.pop("tries", 3)
@@ -84,7 +199,8 @@ def retry_request(fn, *args, **kwargs):
         except requests.HTTPError as e:
             code = getattr(e.response, "status_code", None)
             if code in {429,500,502,503,504} and attempt < tries-1:
-                backoff_sleep(attempt); continue
+                ra = retry_after_seconds(e.response) if code in {429,503} else None
+                backoff_sleep(attempt, ra); continue
             raise
         except requests.RequestException:
             if attempt < tries-1: backoff_sleep(attempt); continue
@@ -97,82 +213,169 @@ AREA_CENTERS: dict[str, Tuple[float,float]] = {
     "Wakad, Pune": (18.5976, 73.7707),
 }
 
+def _deg_per_m(lat: float) -> Tuple[float,float]:
+    return 1 / 111_320, 1 / (111_320 * math.cos(math.radians(lat)))
+
+# degrees-per-metre (lat, lng) for each known area, computed once at import
+_AREA_DEG_PER_M: dict[Tuple[float,float], Tuple[float,float]] = {c: _deg_per_m(c[0]) for c in AREA_CENTERS.values()}
+
 def build_grid(center: Tuple[float,float], radius_m=2900, step_m=1800, size=4) -> List[Tuple[float,float]]:
     lat0,lng0 = center
-    m_per_deg_lat = 111_320
-    m_per_deg_lng = 111_320 * math.cos(math.radians(lat0))
-    dlat, dlng = step_m/m_per_deg_lat, step_m/m_per_deg_lng
+    lat_per_m, lng_per_m = _AREA_DEG_PER_M.get(center) or _deg_per_m(lat0)
+    dlat, dlng = step_m*lat_per_m, step_m*lng_per_m
     offs = [i - (size-1)/2 for i in range(size)]
     pts = [(lat0+oy*dlat, lng0+ox*dlng) for oy in offs for ox in offs]
     if center not in pts: pts.append(center)
     return pts
 
 def text_search_page(query: str, page_token: Optional[str]=None, page_size: int=20,
-                     center: Optional[Tuple[float,float]]=None, radius_m: int=2900) -> Dict[str,Any]:
+                     center: Optional[Tuple[float,float]]=None, radius_m: int=2900,
+                     mask: str="basic") -> Dict[str,Any]:
     page_size = max(1, min(page_size, 20))
     payload: Dict[str,Any] = {"textQuery": query, "pageSize": page_size}
     if page_token: payload["pageToken"] = page_token
     if center:
         lat,lng = center
         payload["locationBias"] = {"circle":{"center":{"latitude":lat,"longitude":lng},"radius":radius_m}}
-    return _post_json(TEXT_URL, headers=_headers(TEXT_FIELDS), payload=payload)
+    return _post_json(TEXT_URL, headers=_HEADERS_TEXT[mask], payload=payload)
+
+_PAGE_TOKEN_WAITS = (0.4, 0.8, 1.6, 2.1)
+
+def _page_token_not_ready(e: requests.HTTPError) -> bool:
+    r = e.response
+    return r is not None and r.status_code == 400 and "INVALID_ARGUMENT" in (r.text or "")
 
 def paginate_text_search(query: str, total_needed: int,
-                         center: Optional[Tuple[float,float]]=None, radius_m: int = 2900) -> List[Dict[str,Any]]:
+                         center: Optional[Tuple[float,float]]=None, radius_m: int = 2900,
+                         mask: str = "basic") -> List[Dict[str,Any]]:
     results: List[Dict[str,Any]] = []; token=None; pages=0
     while len(results) < total_needed and pages < 25:
         remaining = total_needed - len(results)
-        data = retry_request(text_search_page, query, page_token=token,
-                             page_size=min(20,remaining), center=center, radius_m=radius_m)
-        results.extend(data.get("places") or []); pages += 1
+        # v1 page tokens are usually live at once; only back off (0.4s doubling, capped at 2.1s)
+        # while Places rejects this one as not ready yet
+        for wait_s in _PAGE_TOKEN_WAITS + (None,):
+            try:
+                data = retry_request(text_search_page, query, page_token=token,
+                                     page_size=min(20,remaining), center=center, radius_m=radius_m,
+                                     mask=mask)
+                break
+            except requests.HTTPError as e:
+                if wait_s is None or not (token and _page_token_not_ready(e)): raise
+                time.sleep(wait_s)
+        page_places = data.get("places") or []; page_size = min(20,remaining)
+        results.extend(page_places); pages += 1
         token = data.get("nextPageToken")
-        if not token: break
-        time.sleep(1.5)
+        # a short page is the last one even if a token came back; don't spend a request (or token wait) on it
+        if not token or len(page_places) < page_size: break
     return results[:total_needed]
 
+def search_key(query: str, center: Optional[Tuple[float,float]]) -> Tuple[str, Optional[Tuple[float,float]]]:
+    # case/whitespace-insensitive query + center rounded to ~110 m, so near-identical searches share one call
+    return " ".join(query.lower().split()), (round(center[0], 3), round(center[1], 3)) if center else None
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_text_search(query: str, total_needed: int,
+                       center: Optional[Tuple[float,float]]=None, radius_m: int = 2900,
+                       mask: str = "basic") -> List[Dict[str,Any]]:
+    return paginate_text_search(query, total_needed, center=center, radius_m=radius_m, mask=mask)
+
+DISK_CACHE_TTL = 7 * 24 * 3600
+EMPTY_CRAWL_TTL = 24 * 3600  # a crawl that found nothing may just have hit a slow/down site
+
+@st.cache_resource(show_spinner=False)
+def disk_cache() -> DiskCache:
+    # survives Streamlit restarts/redeploys; st.cache_data below stays as the in-process front
+    return DiskCache(".places_cache.sqlite")
+
+@st.cache_resource(show_spinner=False)
+def seen_store() -> SeenStore:
+    # ids already exported per area, so repeat runs only return new places
+    return SeenStore(".places_seen.db")
+
 @st.cache_data(ttl=7200, show_spinner=False)
 def cached_place_details(place_id: str, want_reviews: bool) -> Dict[str,Any]:
-    fields = DETAIL_FIELDS_FULL if want_reviews else DETAIL_FIELDS_FAST
-    return _get_json(DETAIL_URL.format(place_id=place_id), headers=_headers(fields))
+    key = f"details:{place_id}:{int(want_reviews)}"
+    hit = disk_cache().get(key)
+    if hit is not None: return hit
+    headers = _HEADERS_DETAIL_FULL if want_reviews else _HEADERS_DETAIL_FAST
+    det = _get_json(DETAIL_URL.format(place_id=place_id), headers=headers)
+    disk_cache().set(key, det, expire=DISK_CACHE_TTL)
+    return det
 
 @st.cache_data(ttl=7200, show_spinner=False)
 def cached_crawl_site(url: str) -> Dict[str,Any]:
-    try: return crawl_doctor_site(url) or {}
+    key = f"crawl:{url}"
+    hit = disk_cache().get(key)
+    if hit is not None: return hit
+    try: info = crawl_doctor_site(url) or {}
     except Exception: return {}
+    found = info.get("email") or info.get("years_of_experience") is not None
+    disk_cache().set(key, info, expire=DISK_CACHE_TTL if found else EMPTY_CRAWL_TTL)
+    return info
+
+# social/aggregator listings: they block scraping or carry no email/experience, so crawling them is wasted
+_SKIP_DOMAINS = ("facebook.com","instagram.com","practo.com","justdial.com","lybrate.com","youtube.com")
+
+@lru_cache(maxsize=4096)
+def is_crawlable(url: str) -> bool:
+    if not url or url == "N/A": return False
+    host = (urlsplit(url).hostname or "").lower()
+    return bool(host) and not any(host == d or host.endswith("." + d) for d in _SKIP_DOMAINS)
+
+_NL_TABLE = str.maketrans({"\n": " ", "\r": " "})
 
 def summarize_reviews(reviews: List[Dict[str,Any]]) -> str:
     if not reviews: return "N/A"
-    snippets = []
-    for rv in reviews[:5]:
-        t = (rv.get("text") or {}).get("text","")
-        if t: snippets.append(t.strip().replace("\n"," ")[:140])
+    texts = ((rv.get("text") or {}).get("text","") for rv in reviews[:5])
+    snippets = [t.translate(_NL_TABLE).strip()[:140] for t in texts if t]
     return " | ".join(snippets) if snippets else "N/A"
 
-_DOCTOR_PAT = re.compile(r"\bDr\.?\s*[A-Z][A-Za-z.\- ]{1,60}", re.UNICODE)
-_CLINIC_WORDS = ("clinic","hospital","medical","centre","center","diagnostic","labs","skin","laser","hair","institute","speciality")
-
-def split_doctor_and_clinic(place_name: str) -> Tuple[str,str]:
-    if not place_name: return "N/A","N/A"
-    name = place_name.strip(); low = name.lower()
-    m = _DOCTOR_PAT.search(name)
-    if m:
-        doc = m.group(0).strip(" -|,"); rest = (name[:m.start()] + name[m.end():]).strip(" -|,")
-        clinic = rest if (rest and any(w in rest.lower() for w in _CLINIC_WORDS)) else "N/A"
-        return doc, clinic
-    if any(w in low for w in _CLINIC_WORDS): return "N/A",name
-    return "N/A",name
-
+@lru_cache(maxsize=4096)
 def make_recommendation(rating: Optional[float], count: Optional[int]) -> str:
     if rating is None or count is None or count == 0: return "Insufficient data"
     if rating >= 4.5 and count >= 50: return "Highly recommended"
     if rating >= 4.0 and count >= 10: return "Recommended"
     return "Consider with caution"
 
-def _get_display_name(det: Dict[str,Any], p: Dict[str,Any]) -> str:
+def _get_display_name(det: Dict[str,Any]) -> str:
     dn = det.get("displayName")
     if isinstance(dn, dict): return dn.get("text","") or ""
     if isinstance(dn, str): return dn
-    return (p.get("displayName") or {}).get("text","") if isinstance(p.get("displayName"), dict) else p.get("displayName") or ""
+    return ""
+
+# the exact specialty strings mapped to search keywords - keep simple, include short forms
+_SPECIALTY_KEYWORDS: dict[str, Tuple[str,...]] = {
+    "Cardiology (heart)": ("cardiology","cardiologist","heart clinic"),
+    "Dermatology (skin)": ("dermatology","dermatologist","skin clinic","cosmetology"),
+    "Neurology (brain and nervous system)": ("neurology","neurologist","neuro clinic"),
+    "Oncology (cancer)": ("oncology","oncologist","cancer centre"),
+    "General surgery": ("general surgery","general surgeon","surgery"),
+    "Orthopaedics": ("orthopaedics","orthopaedic","bone clinic","joint replacement"),
+    "Neurosurgery": ("neurosurgery","neurosurgeon"),
+    "Paediatrics (child health)": ("paediatrics","paediatrician","child specialist"),
+    "Obstetrics/gynaecology (women's health)": ("obstetrics","gynaecology","obgyn","obstetrician"),
+    "Psychiatry (mental health)": ("psychiatry","psychiatrist"),
+}
+_PHRASE_SUFFIXES = ("in", "doctor", "clinic", "hospital")
+
+@lru_cache(maxsize=256)
+def phrases(sp: str, area: str) -> Tuple[str,...]:
+    return tuple(f"{k} {sfx} {area}" for k in _SPECIALTY_KEYWORDS.get(sp, (sp,)) for sfx in _PHRASE_SUFFIXES)
+
+# exact output column order from the PDF
+EXPECTED_COLS = [
+    "Complete address",
+    "Doctors name",
+    "Specialty",
+    "Clinic/Hospital",
+    "Years of experience",
+    "Contact number",
+    "Contact email",
+    "Ratings",
+    "Reviews",
+    "Summary of Pros and Cons (Summary of reviews), and recommendation",
+]
+NUMERIC_COLS = {"Ratings", "Reviews"}
 
 # =============== UI (assignment-specific) ===============
 with st.sidebar:
@@ -200,171 +403,216 @@ with st.sidebar:
     target_total = st.slider("Target results per area", 50, 600, 200, step=25)
 
     preset = st.radio("Speed preset", ["Turbo (max)", "Balanced", "Careful"], index=1)
+    inline_details = st.checkbox("Take details from search results (fewer API calls)", value=True)
     run = st.button("Find Doctors")
 
 if preset == "Turbo (max)":
     fast_mode = True
-    details_threads, crawl_threads = 32, 12
+    details_threads, crawl_threads, search_window = 32, 12, 8
     grid_size, grid_radius, grid_step = 4, 2900, 1800
 elif preset == "Balanced":
     fast_mode = True
-    details_threads, crawl_threads = 20, 8
+    details_threads, crawl_threads, search_window = 20, 8, 6
     grid_size, grid_radius, grid_step = 3, 3200, 2200
 else:
     fast_mode = False
-    details_threads, crawl_threads = 12, 6
+    details_threads, crawl_threads, search_window = 12, 6, 3
     grid_size, grid_radius, grid_step = 3, 3500, 2500
 
 # =============== Run search ===============
 if run:
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-
     progress = st.progress(0); status = st.empty()
-    rows: List[Dict[str,Any]] = []; seen: set[str] = set()
+    seen: set[str] = set(); seen_lock = threading.Lock()
+
+    def claim(pid: str) -> bool:
+        # atomic check-and-add, so a place id is only ever fetched once per run
+        with seen_lock:
+            if pid in seen: return False
+            seen.add(pid); return True
 
     center = AREA_CENTERS.get(area)
     grid_points = build_grid(center, radius_m=grid_radius, step_m=grid_step, size=grid_size) if center else [None]
 
-    def phrases(sp: str) -> List[str]:
-        # map the exact specialty strings to search phrases - keep simple, include short forms
-        mapping = {
-            "Cardiology (heart)": ["cardiology","cardiologist","heart clinic"],
-            "Dermatology (skin)": ["dermatology","dermatologist","skin clinic","cosmetology"],
-            "Neurology (brain and nervous system)": ["neurology","neurologist","neuro clinic"],
-            "Oncology (cancer)": ["oncology","oncologist","cancer centre"],
-            "General surgery": ["general surgery","general surgeon","surgery"],
-            "Orthopaedics": ["orthopaedics","orthopaedic","bone clinic","joint replacement"],
-            "Neurosurgery": ["neurosurgery","neurosurgeon"],
-            "Paediatrics (child health)": ["paediatrics","paediatrician","child specialist"],
-            "Obstetrics/gynaecology (women's health)": ["obstetrics","gynaecology","obgyn","obstetrician"],
-            "Psychiatry (mental health)": ["psychiatry","psychiatrist"],
-        }
-        keys = mapping.get(sp, [sp])
-        phrases = []
-        for k in keys:
-            phrases.extend([f"{k} in {area}", f"{k} doctor {area}", f"{k} clinic {area}", f"{k} hospital {area}"])
-        return phrases
-
-    combos: List[Tuple[str,str,Optional[Tuple[float,float]]]] = []
+    # keyed by search_key so duplicate phrases / coinciding grid points are only searched once;
+    # the value keeps the original phrase and grid point, which are what gets sent
+    combos: Dict[Tuple[str,Optional[Tuple[float,float]]], Tuple[str,Optional[Tuple[float,float]],str]] = {}
     for sp in specialties:
-        for phr in phrases(sp):
+        for phr in phrases(sp, area):
             for gp in grid_points:
-                combos.append((sp, phr, gp))
-
-    fetched_places: List[Dict[str,Any]] = []
-    combo_idx = 0
+                combos.setdefault(search_key(phr, gp), (phr, gp, sp))
 
-    cache_file = pathlib.Path(f".cache_{area.split(',')[0].lower()}.json")
+    area_key = area.split(',')[0].lower()
     try:
-        cached_ids = set(json.loads(cache_file.read_text()))
+        # ids from the old per-area JSON seen list are carried over on first use
+        seen_store().import_json(area_key, f".cache_{area_key}.json")
+        cached_ids = seen_store().ids(area_key)
     except Exception:
         cached_ids = set()
 
-    while len(fetched_places) < target_total and combo_idx < len(combos):
-        sp, phr, gp = combos[combo_idx]; combo_idx += 1
-        status.info(f"Searching: *{phr}* @ {gp or 'no-bias'} — {len(fetched_places)}/{target_total}")
-        try:
-            batch = paginate_text_search(phr, total_needed=40, center=gp, radius_m=grid_radius)
-        except Exception as e:
-            st.warning(f"Text search failed for '{phr}': {e}"); continue
-
-        for p in batch:
-            pid = p.get("id")
-            if pid and pid not in seen and pid not in cached_ids:
-                seen.add(pid); fetched_places.append(p)
-                if len(fetched_places) >= target_total: break
-
-        progress.progress(min(95, int(len(fetched_places)/max(1,target_total)*100)))
-
-    if fetched_places:
-        cached_ids.update([p["id"] for p in fetched_places if p.get("id")])
-        try: cache_file.write_text(json.dumps(sorted(cached_ids)))
+    # rows are streamed straight into an in-memory workbook as they are built (constant_memory
+    # flushes each row to a temp part, so the sheet never sits in RAM); the finished bytes
+    # go straight to the download button without a round trip through the working dir
+    out_name = f"{area.split(',')[0].lower()}_doctors_assignment.xlsx".replace(" ", "")
+    xlsx_buf = io.BytesIO()
+    wb = xlsxwriter.Workbook(xlsx_buf, {"constant_memory": True, "strings_to_urls": False})
+    ws = wb.add_worksheet(); ws.write_row(0, 0, EXPECTED_COLS)
+    # results are kept column-wise, which is the shape st.dataframe takes without a row->column transpose
+    col_buffers: Dict[str, List[Any]] = {c: [] for c in EXPECTED_COLS}; n_rows = 0
+    # only ids that made it into the sheet are marked seen; a place whose details failed or were
+    # cancelled by the breaker stays eligible for the next run
+    written_ids: List[str] = []
+
+    def _follow(src: Future, dst: Future) -> None:
+        try: dst.set_result(src.result())
+        except Exception: dst.set_result({})
+
+    def crawl_or_empty(url):
+        return cached_crawl_site(url) or {}
+
+    # one pool for the whole run, pipelined search -> details -> crawl: text searches are kept
+    # `search_window` deep, each new place's details are submitted as soon as its search returns,
+    # and each place's site crawl as soon as its details are in, so every stage overlaps the others
+    fetched_places: List[Dict[str,Any]] = []
+    processed = 0
+    combo_iter = iter(combos.values())
+    futs: Dict[Future, Tuple[str, Any]] = {}
+    # consecutive searches per specialty that yielded <2 new ids; stop issuing its combos at 3
+    stale_runs: Dict[str, int] = {sp: 0 for sp in specialties}
+
+    # full search mask when it stands in for the details; ids only when details are fetched per place
+    search_mask = ("basic" if fast_mode else "full") if inline_details else "ids"
+
+    # circuit breaker: 8 of the last 10 detail calls failing means Places is degraded (quota, outage),
+    # so queued Places work is cancelled and nothing new is sent; rows already in the pipeline still finish
+    detail_failures: Deque[bool] = deque(maxlen=10); breaker_open = False
+
+    with ThreadPoolExecutor(max_workers=max(1, min(details_threads, 32)) + crawl_threads,
+                            thread_name_prefix="places") as ex:
+        def submit_search() -> bool:
+            if breaker_open: return False
+            for phr, gp, sp in combo_iter:
+                if stale_runs[sp] >= 3: continue  # this specialty stopped turning up new places
+                status.info(f"Searching: *{phr}* @ {gp or 'no-bias'} — {len(fetched_places)}/{target_total}")
+                futs[ex.submit(cached_text_search, phr, 40, gp, grid_radius, search_mask)] = ("text", (phr, sp))
+                return True
+            return False
+
+        # clinics listing several doctors share one websiteUri: within a run each site is crawled once,
+        # later places on it get a future that completes with the first crawl's result
+        crawl_inflight: Dict[str, Future] = {}
+
+        def submit_crawl(sp: str, pid: str, det: Dict[str,Any]) -> None:
+            website = det.get("websiteUri") or "N/A"
+            fut = Future()
+            if not is_crawlable(website): fut.set_result({})  # row still goes through the crawl branch, no worker used
+            elif website not in crawl_inflight: fut = crawl_inflight[website] = ex.submit(crawl_or_empty, website)
+            else: crawl_inflight[website].add_done_callback(lambda src, dst=fut: _follow(src, dst))
+            futs[fut] = ("crawl", (sp, pid, det))
+
+        for _ in range(search_window):
+            if not submit_search(): break
+
+        while futs:
+            done, _ = wait(futs, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, item = futs.pop(fut)
+                if kind == "text":
+                    phr, sp = item
+                    try: batch = fut.result()
+                    except Exception as e:
+                        st.warning(f"Text search failed for '{phr}': {e}"); batch = None
+                    before = len(fetched_places)
+                    for p in batch or []:
+                        if len(fetched_places) >= target_total or (breaker_open and not inline_details): break
+                        pid = p.get("id")
+                        if pid and pid not in cached_ids and claim(pid):
+                            fetched_places.append(p)
+                            if inline_details and p.get("displayName"):
+                                # the search mask already carries every detail field we use
+                                processed += 1; submit_crawl(sp, pid, p)
+                                continue
+                            futs[ex.submit(retry_request, cached_place_details, pid, not fast_mode, tries=3)] = ("detail", (sp, p))
+                    if batch is not None:
+                        stale_runs[sp] = stale_runs[sp] + 1 if len(fetched_places) - before < 2 else 0
+                    if len(fetched_places) < target_total: submit_search()
+                    progress.progress(min(95, int(len(fetched_places)/max(1,target_total)*100)))
+                elif kind == "detail":
+                    sp, p = item
+                    try: det = fut.result()
+                    except Exception as e:
+                        st.info(f"Details failed for {p.get('id')}: {e}")
+                        detail_failures.append(True)
+                        if not breaker_open and sum(detail_failures) >= 8:
+                            breaker_open = True
+                            for f, (k, _) in list(futs.items()):
+                                if k != "crawl" and f.cancel(): del futs[f]
+                            st.warning("Places API keeps failing; stopped sending new requests for this run.")
+                        continue
+                    detail_failures.append(False)
+                    processed += 1; submit_crawl(sp, p["id"], det)
+                    status.write(f"Fetched details {processed}/{len(fetched_places)}")
+                else:
+                    sp, pid, det = item
+                    extra = {}
+                    try: extra = fut.result()
+                    except Exception: pass
+
+                    # det is the canonical row source: the search entry itself, or its detail response
+                    place_name = _get_display_name(det)
+                    doc_name, clinic_name = split_doctor_and_clinic(place_name)
+                    # missing fields stay None here; "N/A" is filled in once per row/column below
+                    addr = det.get("formattedAddress") or None
+                    phone = det.get("internationalPhoneNumber") or det.get("nationalPhoneNumber") or None
+                    rating = det.get("rating"); count = det.get("userRatingCount")
+                    summary = "N/A" if fast_mode else (summarize_reviews(det.get("reviews",[])) or "N/A")
+                    recommendation = make_recommendation(rating, count)
+                    combined_summary = (summary if summary and summary!="N/A" else "")
+                    if recommendation: combined_summary = (combined_summary + "\n\nRecommendation: " + recommendation).strip()
+                    if not combined_summary: combined_summary = "N/A"
+
+                    contact_email = extra.get("email") or None
+                    y = extra.get("years_of_experience"); years_exp = str(y) if isinstance(y,int) else (y or None)
+
+                    # *** EXACT column order from PDF (EXPECTED_COLS) ***
+                    values = (
+                        addr,
+                        doc_name,
+                        sp,  # the specialty whose search found this place
+                        clinic_name,
+                        years_exp,
+                        phone,
+                        contact_email,
+                        rating,  # Ratings/Reviews stay numeric (None when missing) so the preview
+                        count,   # columns keep a float/int dtype; "N/A" is only written to the sheet
+                        combined_summary,
+                    )
+                    for col, v in zip(col_buffers.values(), values): col.append(v)
+                    n_rows += 1
+                    ws.write_row(n_rows, 0, ["N/A" if v is None else v for v in values])
+                    written_ids.append(pid)
+    wb.close()
+    # one pass per text column for the preview; Ratings/Reviews keep None so they stay numeric
+    for c in EXPECTED_COLS:
+        if c not in NUMERIC_COLS: col_buffers[c] = ["N/A" if v is None else v for v in col_buffers[c]]
+
+    if written_ids:
+        try: seen_store().add(area_key, written_ids)
         except Exception: pass
 
     if not fetched_places:
         st.error("No results fetched. Try Balanced preset or add more specialties.")
     else:
-        # details
-        with ThreadPoolExecutor(max_workers=details_threads) as ex:
-            futures = {ex.submit(retry_request, cached_place_details, p["id"], not fast_mode, tries=3): p
-                       for p in fetched_places if p.get("id")}
-            enriched = []; processed = 0
-            for fut in as_completed(futures):
-                p = futures[fut]
-                try: det = fut.result()
-                except Exception as e:
-                    st.info(f"Details failed for {p.get('id')}: {e}"); continue
-                website = det.get("websiteUri") or p.get("websiteUri") or "N/A"
-                enriched.append((p, det, website))
-                processed += 1
-                status.write(f"Fetched details {processed}/{len(fetched_places)}")
-
-        # crawls
-        def crawl_or_empty(url):
-            if url and url != "N/A": return cached_crawl_site(url) or {}
-            return {}
-        with ThreadPoolExecutor(max_workers=12) as ex2:
-            crawl_map = {ex2.submit(crawl_or_empty, web): (p, det, web) for (p, det, web) in enriched}
-            for fut in as_completed(crawl_map):
-                p, det, website = crawl_map[fut]
-                extra = {}
-                try: extra = fut.result()
-                except Exception: pass
-
-                place_name = _get_display_name(det, p)
-                doc_name, clinic_name = split_doctor_and_clinic(place_name)
-                addr = det.get("formattedAddress","") or p.get("formattedAddress") or "N/A"
-                phone = det.get("internationalPhoneNumber") or det.get("nationalPhoneNumber") \
-                        or p.get("internationalPhoneNumber") or p.get("nationalPhoneNumber") or "N/A"
-                rating = det.get("rating"); count = det.get("userRatingCount")
-                summary = "N/A" if fast_mode else (summarize_reviews(det.get("reviews",[])) or "N/A")
-                recommendation = make_recommendation(rating, count)
-                combined_summary = (summary if summary and summary!="N/A" else "")
-                if recommendation: combined_summary = (combined_summary + "\n\nRecommendation: " + recommendation).strip()
-                if not combined_summary: combined_summary = "N/A"
-
-                contact_email = extra.get("email") or "N/A"
-                y = extra.get("years_of_experience"); years_exp = str(y) if isinstance(y,int) else (y or "N/A")
-                sp_guess = (p.get("types") or ["N/A"])[0]
-
-                # *** EXACT column names from PDF ***
-                rows.append({
-                    "Complete address": addr,
-                    "Doctors name": doc_name if doc_name else "N/A",
-                    "Specialty": sp_guess.title(),
-                    "Clinic/Hospital": clinic_name if clinic_name else "N/A",
-                    "Years of experience": years_exp,
-                    "Contact number": phone,
-                    "Contact email": contact_email,
-                    "Ratings": rating if rating is not None else "N/A",
-                    "Reviews": count if count is not None else "N/A",
-                    "Summary of Pros and Cons (Summary of reviews), and recommendation": combined_summary,
-                })
-
         progress.progress(100)
 
-        if not rows:
+        if not n_rows:
             st.error("No rows built. Try again.")
         else:
-            df = pd.DataFrame(rows)
-            # enforce exact column order from PDF
-            expected_cols = [
-                "Complete address",
-                "Doctors name",
-                "Specialty",
-                "Clinic/Hospital",
-                "Years of experience",
-                "Contact number",
-                "Contact email",
-                "Ratings",
-                "Reviews",
-                "Summary of Pros and Cons (Summary of reviews), and recommendation",
-            ]
-            df = df.reindex(columns=expected_cols)
-            st.success(f"Done. {len(df)} rows for {area}.")
-            st.dataframe(df, use_container_width=True, hide_index=True)
-            out_path = f"{area.split(',')[0].lower()}_doctors_assignment.xlsx".replace(" ", "")
-            df.to_excel(out_path, index=False)
-            with open(out_path, "rb") as f:
-                st.download_button("Download Excel", f, file_name=out_path,
-                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            # column buffers go to st.dataframe as-is; app.py itself never needs pandas
+            st.success(f"Done. {n_rows} rows for {area}.")
+            st.dataframe(col_buffers, use_container_width=True, hide_index=True)
+            st.download_button("Download Excel", xlsx_buf.getvalue(), file_name=out_name,
+                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+    if ERROR_BUFFER:
+        with st.expander(f"{len(ERROR_BUFFER)} API errors (most recent)"):
+            st.json([{"status": code, "body": body} for code, body in ERROR_BUFFER])
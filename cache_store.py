@@ -0,0 +1,108 @@
+# cache_store.py
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(value: Any) -> bytes:
+    return orjson.dumps(value) if orjson else json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _loads(blob: bytes) -> Any:
+    return orjson.loads(blob) if orjson else json.loads(blob)
+
+
+class DiskCache:
+    """
+    Tiny persistent key/value cache on a single SQLite file.
+    Values are JSON-serialisable objects (Places responses, crawl results);
+    entries carry an optional absolute expiry and are dropped lazily on read.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM cache WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        if expires is not None and expires < time.time():
+            with self._lock:
+                self._conn.execute("DELETE FROM cache WHERE key=?", (key,))
+            return None
+        return _loads(value)
+
+    def set(self, key: str, value: Any, expire: Optional[float] = None) -> None:
+        expires = time.time() + expire if expire else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache(key, value, expires) VALUES (?,?,?)",
+                (key, _dumps(value), expires),
+            )
+
+
+class SeenStore:
+    """
+    Place ids already exported, per area, in one SQLite table.
+    Recording a run is an INSERT OR IGNORE of just its ids instead of
+    rewriting the whole set. Safe to share between Streamlit sessions.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen(pid TEXT NOT NULL, area TEXT NOT NULL, PRIMARY KEY(pid, area))"
+            )
+            # legacy files already imported, so each is read once
+            self._conn.execute("CREATE TABLE IF NOT EXISTS imported(path TEXT PRIMARY KEY)")
+
+    def ids(self, area: str) -> set:
+        with self._lock:
+            return {r[0] for r in self._conn.execute("SELECT pid FROM seen WHERE area=?", (area,))}
+
+    def add(self, area: str, pids) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR IGNORE INTO seen(pid, area) VALUES (?,?)", ((p, area) for p in pids))
+            self._conn.execute("COMMIT")
+
+    def import_json(self, area: str, path: str) -> None:
+        """
+        One-time import of a pre-SQLite ``.cache_<area>.json`` seen list (a JSON
+        array of place ids). A missing or unreadable file is skipped.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM imported WHERE path=?", (path,)).fetchone():
+                return
+        try:
+            with open(path, "rb") as f:
+                pids = _loads(f.read())
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen(pid, area) VALUES (?,?)",
+                ((p, area) for p in pids if isinstance(p, str)),
+            )
+            self._conn.execute("INSERT OR IGNORE INTO imported(path) VALUES (?)", (path,))
+            self._conn.execute("COMMIT")
@@ -1,5 +1,5 @@
 # check_excel.py
-import pandas as pd, sys
+import openpyxl, sys
 
 EXPECTED_COLS = [
     "Complete address","Doctors name","Specialty","Clinic/Hospital","Years of experience",
@@ -7,13 +7,31 @@ EXPECTED_COLS = [
     "Summary of Pros and Cons (Summary of reviews), and recommendation"
 ]
 
+def sheet_summary(ws):
+    # header row + the sheet's stored dimension only, instead of parsing every cell
+    cols = [c for c in next(ws.iter_rows(max_row=1, values_only=True), ()) if c is not None]
+    n_rows = ws.max_row
+    if n_rows is None:  # no <dimension> in the file: count rows (still streamed, values only)
+        n_rows = sum(1 for _ in ws.iter_rows(values_only=True))
+    return cols, max(0, n_rows - 1)
+
 def main(path):
-    df = pd.read_excel(path)
-    missing = [c for c in EXPECTED_COLS if c not in df.columns]
-    extra = [c for c in df.columns if c not in EXPECTED_COLS]
-    print("Rows:", len(df))
-    print("Missing columns:", missing or "None")
-    print("Extra columns:", extra or "None")
+    # every sheet is checked (scraper.py writes one per specialty); rows are totalled
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    total = 0
+    for ws in wb.worksheets:
+        cols, n_rows = sheet_summary(ws)
+        total += n_rows
+        missing = [c for c in EXPECTED_COLS if c not in cols]
+        extra = [c for c in cols if c not in EXPECTED_COLS]
+        if len(wb.worksheets) > 1:
+            print(f"[{ws.title}]")
+        print("Rows:", n_rows)
+        print("Missing columns:", missing or "None")
+        print("Extra columns:", extra or "None")
+    wb.close()
+    if len(wb.worksheets) > 1:
+        print("Total rows:", total)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
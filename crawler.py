@@ -1,11 +1,27 @@
 import re
 import json
+import threading
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin
 from datetime import datetime
 from typing import Optional, Tuple, Dict, List
 
+try:
+    import orjson  # optional: faster JSON-LD decoding
+except ImportError:
+    orjson = None
+
+# lxml's C parser builds the tree several times faster than the pure-Python html.parser
+try:
+    import lxml  # noqa: F401
+    _PARSER = "lxml"
+except ImportError:
+    _PARSER = "html.parser"
+
 # Patterns for email and obfuscated email forms
 EMAIL_PAT = re.compile(r"[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}", re.I)
 
@@ -32,6 +48,12 @@ EXP_PAT = re.compile(
     re.I | re.X,
 )
 
+# literal words every EXP_PAT match must contain, searched case-insensitively on the text
+# itself (no lowercased copy of the page); pages without them skip EXP_PAT entirely
+_EXP_HINT = re.compile(r"experience|since", re.I)
+_OVER_HINT = re.compile(r"over", re.I)
+_YEAR_HINT = re.compile(r"year|yr", re.I)
+
 
 def _norm_obfuscated(m: re.Match) -> str:
     return f"{m.group(1)}@{m.group(2)}.{m.group(3)}"
@@ -44,7 +66,8 @@ def _infer_years_from_year(year: int) -> Optional[int]:
     return None
 
 
-def extract_email_and_exp(text: str) -> Tuple[Optional[str], Optional[int]]:
+def extract_email_and_exp(text: str, only_years: bool = False) -> Tuple[Optional[str], Optional[int]]:
+    """only_years=True skips both email scans, for callers that already have an email."""
     email = None
     years = None
 
@@ -52,12 +75,13 @@ def extract_email_and_exp(text: str) -> Tuple[Optional[str], Optional[int]]:
         return None, None
 
     # direct email
-    m = EMAIL_PAT.search(text)
+    m = None if only_years or "@" not in text else EMAIL_PAT.search(text)
     if m:
         email = m.group(0)
 
-    # obfuscated email like name [at] domain [dot] com
-    if not email:
+    # obfuscated email like name [at] domain [dot] com; no prefilter, since the pattern
+    # also takes a bare "at" and that substring is on nearly every page anyway
+    if not email and not only_years:
         ob = OBFUSC_EMAIL_PAT.search(text)
         if ob:
             try:
@@ -66,7 +90,9 @@ def extract_email_and_exp(text: str) -> Tuple[Optional[str], Optional[int]]:
                 email = None
 
     # years of experience patterns
-    em = EXP_PAT.search(text)
+    em = None
+    if _EXP_HINT.search(text) or (_OVER_HINT.search(text) and _YEAR_HINT.search(text)):
+        em = EXP_PAT.search(text)
     if em:
         if em.group("num1"):
             try:
@@ -86,16 +112,93 @@ def extract_email_and_exp(text: str) -> Tuple[Optional[str], Optional[int]]:
     return email, years
 
 
+# one shared session: a site's homepage and its subpages reuse the same keep-alive connection,
+# and many clinic sites (one pool per host) stay warm across crawls
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": "Mozilla/5.0 (compatible; Bot/0.1)"})
+_adapter = HTTPAdapter(pool_connections=64, pool_maxsize=16, pool_block=True)
+_SESSION.mount("https://", _adapter)
+_SESSION.mount("http://", _adapter)
+
+
+# subpage fetches for all crawls in the process; a bounded shared pool instead of one per site
+_SUBPAGE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="subpage")
+
+
+# doctors sharing a clinic site hit the same contact/about pages; only successes are
+# kept (a timeout is retried next time) and only small pages, under a short LRU bound
+_HTML_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_HTML_CACHE_LOCK = threading.Lock()
+_HTML_CACHE_MAX = 32
+_HTML_CACHE_MAX_BYTES = 256 * 1024
+
+
 def fetch_html(url: str, timeout: int = 8) -> Optional[str]:
-    session = requests.Session()
-    session.headers.update({"User-Agent": "Mozilla/5.0 (compatible; Bot/0.1)"})
+    with _HTML_CACHE_LOCK:
+        html = _HTML_CACHE.get(url)
+        if html is not None:
+            _HTML_CACHE.move_to_end(url)
+            return html
     try:
-        r = session.get(url, timeout=timeout)
-        if r.status_code == 200 and r.text:
-            return r.text
+        r = _SESSION.get(url, timeout=timeout)
     except requests.RequestException:
         return None
-    return None
+    if r.status_code != 200 or not r.text:
+        return None
+    html = r.text
+    if len(html) <= _HTML_CACHE_MAX_BYTES:
+        with _HTML_CACHE_LOCK:
+            _HTML_CACHE[url] = html
+            _HTML_CACHE.move_to_end(url)
+            if len(_HTML_CACHE) > _HTML_CACHE_MAX:
+                _HTML_CACHE.popitem(last=False)
+    return html
+
+
+# words in a link's href that suggest a page listing contact details or the doctor's profile
+CANDIDATE_WORDS = ("contact", "about", "team", "doctor", "doctors", "providers", "staff", "meet")
+
+
+def _jsonld_emails(raw: Optional[str]) -> List[str]:
+    try:
+        data = orjson.loads(raw or "{}") if orjson else json.loads(raw or "{}")
+    except Exception:
+        return []
+    objs = data if isinstance(data, list) else [data]
+    return [obj["email"].strip() for obj in objs if isinstance(obj, dict) and isinstance(obj.get("email"), str)]
+
+
+def _scan_page(soup: BeautifulSoup, base_url: str) -> Tuple[Optional[str], List[str], str, List[str]]:
+    """
+    Single walk over a parsed page, collecting in one pass:
+      - the first valid mailto: address
+      - emails found in JSON-LD blocks
+      - the visible text (same strings as soup.get_text(" ", strip=True))
+      - candidate subpage links, in page order
+    """
+    mailto = None
+    jsonld: List[str] = []
+    parts: List[str] = []
+    links: Dict[str, None] = {}
+    for node in soup.descendants:
+        kind = type(node)
+        if kind is NavigableString or kind is CData:
+            text = node.strip()
+            if text:
+                parts.append(text)
+        elif kind is Tag:
+            if node.name == "a":
+                href = node.get("href")
+                if not href:
+                    continue
+                if mailto is None and href.startswith("mailto:") and EMAIL_PAT.fullmatch(href[7:]):
+                    mailto = href[7:]
+                low = href.lower()
+                if any(w in low for w in CANDIDATE_WORDS):
+                    links.setdefault(urljoin(base_url, href))
+            elif node.name == "script" and node.get("type") == "application/ld+json":
+                jsonld.extend(_jsonld_emails(node.string))
+    return mailto, jsonld, " ".join(parts), list(links)
 
 
 def crawl_doctor_site(url: str) -> Dict[str, Optional[object]]:
@@ -109,84 +212,41 @@ def crawl_doctor_site(url: str) -> Dict[str, Optional[object]]:
     if not homepage:
         return {"email": None, "years_of_experience": None}
 
-    soup = BeautifulSoup(homepage, "html.parser")
-
-    # 1) mailto links on homepage
-    email_mailto = None
-    for a in soup.select('a[href^="mailto:"]'):
-        addr = a.get("href", "")[7:]
-        if EMAIL_PAT.fullmatch(addr):
-            email_mailto = addr
-            break
-
-    # 2) JSON-LD with "email"
-    jsonld_emails: List[str] = []
-    for tag in soup.find_all("script", type="application/ld+json"):
-        try:
-            data = json.loads(tag.string or "{}")
-        except Exception:
-            continue
-        objs = data if isinstance(data, list) else [data]
-        for obj in objs:
-            if isinstance(obj, dict):
-                em = obj.get("email")
-                if isinstance(em, str):
-                    jsonld_emails.append(em.strip())
-
-    # 3) visible text on homepage
-    text_home = soup.get_text(" ", strip=True)
-    email_text, years_text = extract_email_and_exp(text_home)
-
-    email = email_mailto or (jsonld_emails[0] if jsonld_emails else None) or email_text
-    years = years_text
-
-    # candidate subpages to inspect (shallow)
-    candidates: set = set()
-    for a in soup.find_all("a", href=True):
-        href = a["href"].lower()
-        if any(w in href for w in ["contact", "about", "team", "doctor", "doctors", "providers", "staff", "meet"]):
-            candidates.add(urljoin(url, a["href"]))
-
-    # crawl up to 8 candidate pages
-    for link in list(candidates)[:8]:
-        if email and years:
-            break
-        html = fetch_html(link)
-        if not html:
-            continue
-        s2 = BeautifulSoup(html, "html.parser")
-
-        # mailto on subpage
-        if not email:
-            for a in s2.select('a[href^="mailto:"]'):
-                addr = a.get("href", "")[7:]
-                if EMAIL_PAT.fullmatch(addr):
-                    email = addr
-                    break
-
-        # json-ld on subpage
-        if not email:
-            for tag in s2.find_all("script", type="application/ld+json"):
-                try:
-                    data = json.loads(tag.string or "{}")
-                except Exception:
-                    continue
-                objs = data if isinstance(data, list) else [data]
-                for obj in objs:
-                    if isinstance(obj, dict) and isinstance(obj.get("email"), str):
-                        email = obj["email"].strip()
-                        break
-                if email:
-                    break
-
-        # extract from visible text
-        if not (email and years):
-            t2 = s2.get_text(" ", strip=True)
-            em2, y2 = extract_email_and_exp(t2)
-            if not email and em2:
-                email = em2
-            if years is None and y2 is not None:
-                years = y2
+    # mailto links, JSON-LD "email" and visible text on the homepage
+    email_mailto, jsonld_emails, text_home, candidates = _scan_page(BeautifulSoup(homepage, _PARSER), url)
+    email = email_mailto or (jsonld_emails[0] if jsonld_emails else None)
+    # text regexes only run for what is still missing: just EXP_PAT when markup already gave the email
+    email_text, years = extract_email_and_exp(text_home, only_years=bool(email))
+    email = email or email_text
+
+    if email and years is not None:
+        return {"email": email, "years_of_experience": years}
+
+    # fetch up to 8 candidate pages (shallow) concurrently, merging each as it arrives
+    futs = [_SUBPAGE_POOL.submit(fetch_html, link) for link in candidates[:8]]
+    links = dict(zip(futs, candidates))
+    try:
+        for fut in as_completed(futs):
+            html = fut.result()
+            if not html:
+                continue
+            mailto2, jsonld2, t2, _ = _scan_page(BeautifulSoup(html, _PARSER), links[fut])
+
+            # mailto, then json-ld, then visible text on subpage
+            if not email:
+                email = mailto2 or (jsonld2[0] if jsonld2 else None)
+            if not email or years is None:
+                em2, y2 = extract_email_and_exp(t2, only_years=bool(email))
+                if not email and em2:
+                    email = em2
+                if years is None and y2 is not None:
+                    years = y2
+            if email and years is not None:
+                break
+    finally:
+        # drop fetches still queued once both fields are known; running ones finish into the cache
+        for fut in futs:
+            fut.cancel()
 
     return {"email": email, "years_of_experience": years}
 
@@ -0,0 +1,28 @@
+# names.py
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# "Dr" + up to four capitalised name tokens; explicit word structure instead of one 60-char
+# class that also spans spaces, so matching is linear and stops before "- Skin Clinic" etc.
+# Tokens may be a lone initial ("Dr A Mehta", "Dr. R K Joshi") and may carry Latin-1 accents.
+_UPPER = "A-ZÀ-ÖØ-Þ"
+_LETTER = "A-Za-zÀ-ÖØ-öø-ÿ"
+DOCTOR_PAT = re.compile(
+    rf"\bDr\.?\s*[{_UPPER}][{_LETTER}.\-]{{0,40}}(?:\s+[{_UPPER}][{_LETTER}.\-]{{0,30}}){{0,3}}"
+)
+CLINIC_WORDS = ("clinic","hospital","medical","centre","center","diagnostic","labs","skin","laser","hair","institute","speciality")
+CLINIC_RE = re.compile("|".join(map(re.escape, CLINIC_WORDS)), re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def split_doctor_and_clinic(place_name: str) -> Tuple[str, str]:
+    """Split a Places display name into (doctor name, clinic name); "N/A" for a part that is absent."""
+    if not place_name: return "N/A","N/A"
+    name = place_name.strip()
+    m = DOCTOR_PAT.search(name)
+    if m:
+        doc = m.group(0).strip(" -|,"); rest = (name[:m.start()] + name[m.end():]).strip(" -|,")
+        clinic = rest if (rest and CLINIC_RE.search(rest)) else "N/A"
+        return doc, clinic
+    return "N/A",name
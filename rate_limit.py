@@ -0,0 +1,29 @@
+# rate_limit.py
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Client-side QPS cap shared by all worker threads:
+    refills at `rate` tokens per second and allows bursts of up to `burst`.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate, self.burst = rate, burst
+        self._tokens = float(burst)
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._t) * self.rate)
+                self._t = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)  # outside the lock, so other workers can refill/check meanwhile
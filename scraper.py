@@ -1,11 +1,25 @@
 import os
-import json
+import importlib.util
+import sys
+import re
 import time
-import math
+import logging
+import queue
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
-from typing import Dict, Any, List, Tuple
+import xlsxwriter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Tuple
 from dotenv import load_dotenv
+from cache_store import DiskCache
+from rate_limit import TokenBucket
+
+try:
+    import orjson  # optional: faster decoding of the review-heavy Details payloads
+except ImportError:
+    orjson = None
 
 # ------------------------
 # Configuration
@@ -30,9 +44,33 @@ DETAIL_FIELDS = (
     "nationalPhoneNumber,internationalPhoneNumber,rating,userRatingCount,reviews"
 )
 
+# Places types that mark an actual practice
+MEDICAL_TYPES = frozenset({
+    "doctor", "hospital", "health", "dentist", "dental_clinic",
+    "physiotherapist", "chiropractor", "medical_lab", "medical_clinic",
+    "medical_center", "skin_care_clinic", "general_hospital", "pharmacy",
+})
+
+# Places types that never mark a practice; a hit carrying one of these and none
+# of MEDICAL_TYPES skips the Details call (the billed, slower endpoint). Anything
+# unknown still gets the call, so a new practice type in the API is not lost
+NON_MEDICAL_TYPES = frozenset({
+    "gym", "fitness_center", "beauty_salon", "hair_care", "spa", "store",
+    "clothing_store", "shopping_mall", "restaurant", "cafe", "lodging", "school",
+})
+
+# output columns, in order; rows are plain tuples in this layout
+COLS = (
+    "Doctor/Clinic name", "Specialty (from query)", "Clinic/Hospital", "Complete address",
+    "Years of experience", "Contact number", "Contact email", "Ratings", "Reviews count",
+    "Pros/Cons summary", "Recommendation", "Website", "Place ID", "Locality searched",
+)
+
 # ------------------------
 # Init
 # ------------------------
+log = logging.getLogger(__name__)
+
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 if not API_KEY:
@@ -42,42 +80,72 @@ BASE_HEADERS = {
     "Content-Type": "application/json",
     "X-Goog-Api-Key": API_KEY,
 }
+# one pooled keep-alive session for every call; BASE_HEADERS ride on it, so each
+# request only adds its field mask
+SESSION = requests.Session()
+SESSION.headers.update(BASE_HEADERS)
+_retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                 allowed_methods=["GET", "POST"], raise_on_status=False)
+# pool covers every search + details worker (8 + 25), so none waits on or drops a connection
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=40, max_retries=_retries))
+
+# Places per-minute quota: pace every call up front instead of bursting into 429s
+PLACES_QPS = 50
+LIMITER = TokenBucket(PLACES_QPS, burst=10)
+
+# built once here instead of per request
+TEXT_HEADERS   = {"X-Goog-FieldMask": TEXT_FIELDS}
+DETAIL_HEADERS = {"X-Goog-FieldMask": DETAIL_FIELDS}
+DETAIL_URL_TPL = DETAIL_URL.format
 
 # ------------------------
 # Helpers
 # ------------------------
+def _decode(r: requests.Response) -> Dict[str, Any]:
+    return orjson.loads(r.content) if orjson else r.json()
+
 def text_search(query: str, page_token: str | None = None) -> Dict[str, Any]:
     payload: Dict[str, Any] = {"textQuery": query}
     if page_token:
         payload["pageToken"] = page_token
-    r = requests.post(
+    LIMITER.acquire()
+    r = SESSION.post(
         TEXT_URL,
-        headers={**BASE_HEADERS, "X-Goog-FieldMask": TEXT_FIELDS},
+        headers=TEXT_HEADERS,
         json=payload,
         timeout=30
     )
     r.raise_for_status()
-    print(json.dumps(r.json(), indent=2, ensure_ascii=False))  
-    return r.json()
+    data = _decode(r)
+    # only the count on the hot path; set this logger to DEBUG to trace queries
+    log.debug("raw text_search %s: %d places", query, len(data.get("places", [])))
+    return data
 
 def place_details(place_id: str) -> Dict[str, Any]:
-    r = requests.get(
-        DETAIL_URL.format(place_id=place_id),
-        headers={**BASE_HEADERS, "X-Goog-FieldMask": DETAIL_FIELDS},
+    LIMITER.acquire()
+    r = SESSION.get(
+        DETAIL_URL_TPL(place_id=place_id),
+        headers=DETAIL_HEADERS,
         timeout=30
     )
     r.raise_for_status()
-    return r.json()
+    return _decode(r)
+
+# one C-level scan per review instead of a Python loop over the keywords; plain
+# alternation keeps the old substring semantics ("wait" also matches "waiting")
+PROS_RE = re.compile("|".join(["good","great","excellent","friendly","clean","helpful","caring"]), re.I)
+CONS_RE = re.compile("|".join(["rude","wait","delay","expensive","crowd","poor","bad","unprofessional"]), re.I)
 
 def summarize_reviews(reviews: List[Dict[str, Any]]) -> Tuple[str, str]:
     if not reviews:
         return "—", "No strong signal"
     pros, cons = [], []
     for rv in reviews[:5]:
-        txt = (rv.get("text", {}) or {}).get("text", "")[:240].lower()
-        if any(k in txt for k in ["good","great","excellent","friendly","clean","helpful","caring"]):
+        # PROS_RE/CONS_RE are case-insensitive, so no lowercased copy; snippets keep the reviewer's casing
+        txt = ((rv.get("text") or {}).get("text") or "")[:240]
+        if PROS_RE.search(txt):
             pros.append(txt[:80])
-        if any(k in txt for k in ["rude","wait","delay","expensive","crowd","poor","bad","unprofessional"]):
+        if CONS_RE.search(txt):
             cons.append(txt[:80])
     pros_s = "; ".join(pros[:3]) or "—"
     cons_s = "; ".join(cons[:3]) or "—"
@@ -87,88 +155,207 @@ def summarize_reviews(reviews: List[Dict[str, Any]]) -> Tuple[str, str]:
 def safe_get(d: Dict[str, Any], *path, default=None):
     cur = d
     for p in path:
-        cur = cur.get(p, {}) if isinstance(cur, dict) else {}
-    return cur if cur else default
+        if not isinstance(cur, dict):
+            return default
+        cur = cur.get(p)
+        if cur is None:
+            return default
+    return cur
 
 # ------------------------
 # Main runner
 # ------------------------
-def run(output_path: str = "pune_doctors.xlsx") -> tuple[str, int]:
-    rows: List[Dict[str, Any]] = []
-    seen: set[str] = set()
-
-    for area in AREAS:
-        for sp in SPECIALTIES:
-            query = f"{sp} in {area}"
-            try:
-                data = text_search(query)
-            except requests.HTTPError as e:
-                print(f"[WARN] TextSearch error for '{query}': {e.response.text}")
+SEARCH_THREADS = 8   # concurrent TextSearch queries (one per area x specialty)
+DETAIL_THREADS = 25  # concurrent Details calls; each pid is independent
+
+PAGE_TOKEN_WAITS = (0.3, 0.6, 1.2, 2.4)  # backoff while a fresh nextPageToken is not live yet
+
+def next_page(query: str, token: str) -> Dict[str, Any]:
+    """
+    Fetch the page behind `token` straight away instead of after a blind 2s sleep;
+    Places answers INVALID_ARGUMENT until the token is live, so only then back off and retry.
+    """
+    for wait_s in PAGE_TOKEN_WAITS + (None,):
+        try:
+            return text_search(query, page_token=token)
+        except requests.HTTPError as e:
+            if wait_s is None or e.response is None or e.response.status_code != 400 \
+                    or "INVALID" not in e.response.text:
+                raise
+            time.sleep(wait_s)
+
+def iter_pages(query: str) -> Iterator[List[Dict[str, Any]]]:
+    """Each TextSearch page of places for `query`, following nextPageToken."""
+    try:
+        data = text_search(query)
+    except requests.HTTPError as e:
+        print(f"[WARN] TextSearch error for '{query}': {e.response.text}")
+        return
+    yield data.get("places", [])
+
+    next_token = data.get("nextPageToken")
+    while next_token:
+        try:
+            data = next_page(query, next_token)
+        except requests.HTTPError as e:
+            print(f"[WARN] Pagination error for '{query}': {e.response.text}")
+            return
+        yield data.get("places", [])
+        next_token = data.get("nextPageToken")
+
+def pump_pages(pages: "queue.Queue", idx: int, query: str) -> None:
+    """Search worker: puts (idx, places) on `pages` per page as it arrives, then (idx, None)."""
+    try:
+        for places in iter_pages(query):
+            pages.put((idx, places))
+    except Exception as e:  # e.g. connection errors; the future's exception is never read
+        print(f"[WARN] TextSearch failed for '{query}': {e}")
+    finally:
+        pages.put((idx, None))
+
+# Details responses persist across runs (same SQLite file as the Streamlit app, own keys),
+# so a rerun or a resume after a crash only calls the API for places not fetched yet
+CACHE = DiskCache(".places_cache.sqlite")
+DETAILS_TTL = 7 * 24 * 3600
+
+def fetch_details(pid: str) -> Dict[str, Any] | None:
+    key = f"scraper:details:{pid}"
+    det = CACHE.get(key)
+    if det is not None:
+        return det
+    try:
+        det = place_details(pid)
+    except requests.HTTPError as e:
+        print(f"[WARN] Details error {pid}: {e.response.text}")
+        return None
+    except requests.RequestException as e:
+        # connection errors, timeouts, exhausted retries: lose this row, not the whole run
+        print(f"[WARN] Details error {pid}: {e}")
+        return None
+    CACHE.set(key, det, expire=DETAILS_TTL)
+    return det
+
+def write_xlsx(path: str, sheets: Dict[str, List[tuple]]) -> None:
+    """
+    Write each sheet's rows (in COLS layout) with xlsxwriter's constant_memory writer.
+    That mode flushes a row as soon as the next one starts and silently drops later
+    writes to it, so every sheet is written strictly row by row, top to bottom.
+    """
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    for name, sheet_rows in sheets.items():
+        ws = wb.add_worksheet(name)
+        ws.freeze_panes(1, 0)
+        ws.write_row(0, 0, COLS)
+        for i, row in enumerate(sheet_rows, start=1):
+            ws.write_row(i, 0, row)
+    wb.close()
+
+def run(output_path: str = "pune_doctors.xlsx", output_format: str | None = None,
+        sheet_per_specialty: bool = True) -> tuple[str, int]:
+    """
+    Scrape all AREAS x SPECIALTIES and write one row per place to `output_path`.
+    output_format is "xlsx", "csv" or "parquet"; by default it follows the file extension.
+    For xlsx, sheet_per_specialty writes one sheet per specialty instead of a single flat sheet.
+    """
+    output_format = (output_format or os.path.splitext(output_path)[1].lstrip(".") or "xlsx").lower()
+    if output_format not in ("xlsx", "csv", "parquet"):
+        raise ValueError(f"Unsupported output_format: {output_format!r}")
+    # fail before any API call, not after the whole scrape
+    if output_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ImportError("output_format='parquet' needs pyarrow (pip install pyarrow)")
+    rows: List[tuple] = []
+
+    # all queries run concurrently and hand over each page as soon as it arrives, so a page's
+    # Details calls overlap fetching the next page. Pages arrive in no fixed order, so a place
+    # found by several queries is credited to the earliest query (owner = lowest index) when
+    # rows are built, exactly as the old sequential loop did; arrival order never reaches the output
+    queries = [(area, sp) for area in AREAS for sp in SPECIALTIES]
+    # sheet label title-cased once per specialty, not once per row
+    sp_titles = {sp: sp.title() for sp in SPECIALTIES}
+    pages: queue.Queue = queue.Queue()
+    with ThreadPoolExecutor(max_workers=SEARCH_THREADS) as search_ex, \
+         ThreadPoolExecutor(max_workers=DETAIL_THREADS) as detail_ex:
+        for idx, (area, sp) in enumerate(queries):
+            search_ex.submit(pump_pages, pages, idx, f"{sp} in {area}")
+
+        # Details call (required to get phone, website, reviews) is submitted once per pid, the
+        # first time any query returns it; owner/futs are only touched here on the main thread
+        owner: Dict[str, int] = {}
+        futs: Dict[str, Future] = {}
+        order: List[List[str]] = [[] for _ in queries]  # each query's pids, in page order
+        open_queries = len(queries)
+        while open_queries:
+            idx, places = pages.get()
+            if places is None:
+                open_queries -= 1
                 continue
+            # whole page at once: its ids in page order (duplicates within the page collapse)
+            page = {p["id"]: p for p in places if p.get("id")}
+            order[idx].extend(page)
+            for pid, p in page.items():
+                if pid in owner:
+                    owner[pid] = min(owner[pid], idx)
+                    continue
+                owner[pid] = idx
+                types = p.get("types")
+                if types and MEDICAL_TYPES.isdisjoint(types) and not NON_MEDICAL_TYPES.isdisjoint(types):
+                    # e.g. a gym or a shop matching the query: keep the row, from the search fields alone
+                    fut = Future()
+                    fut.set_result(p)
+                else:
+                    fut = detail_ex.submit(fetch_details, pid)
+                futs[pid] = fut
+
+        for idx, pids in enumerate(order):
+            area, sp = queries[idx]
+            sp_title = sp_titles[sp]
+            for pid in pids:
+                if owner.get(pid) != idx:
+                    continue
+                del owner[pid]  # one row per pid, even if its query listed it on two pages
+                det = futs[pid].result()
+                if det is None:
+                    continue
+
+                name = safe_get(det, "displayName", "text")
+                addr = det.get("formattedAddress", "")
+                phone = det.get("internationalPhoneNumber") or det.get("nationalPhoneNumber") or ""
+                website = det.get("websiteUri", "")
+                rating = det.get("rating", None)
+                count  = det.get("userRatingCount", None)
+                reviews = det.get("reviews", [])
+                summary, recommend = summarize_reviews(reviews)
+
+                rows.append((
+                    name, sp_title, name, addr,
+                    "",  # Years of experience: not available via Places
+                    phone,
+                    "",  # Contact email: not available via Places
+                    rating, count, summary, recommend, website, pid, area,
+                ))
 
-            places = data.get("places", [])
-            next_token = data.get("nextPageToken")
-
-            while True:
-                for p in places:
-                    pid = p.get("id")
-                    if not pid or pid in seen:
-                        continue
-                    seen.add(pid)
-
-                    # Details call (required to get phone, website, reviews)
-                    try:
-                        det = place_details(pid)
-                    except requests.HTTPError as e:
-                        print(f"[WARN] Details error {pid}: {e.response.text}")
-                        continue
-
-                    name = safe_get(det, "displayName", "text")
-                    addr = det.get("formattedAddress", "")
-                    phone = det.get("internationalPhoneNumber") or det.get("nationalPhoneNumber") or ""
-                    website = det.get("websiteUri", "")
-                    rating = det.get("rating", None)
-                    count  = det.get("userRatingCount", None)
-                    reviews = det.get("reviews", [])
-                    summary, recommend = summarize_reviews(reviews)
-
-                    rows.append({
-                        "Doctor/Clinic name": name,
-                        "Specialty (from query)": sp.title(),
-                        "Clinic/Hospital": name,
-                        "Complete address": addr,
-                        "Years of experience": "",     # Not available via Places
-                        "Contact number": phone,
-                        "Contact email": "",           # Not available via Places
-                        "Ratings": rating,
-                        "Reviews count": count,
-                        "Pros/Cons summary": summary,
-                        "Recommendation": recommend,
-                        "Website": website,
-                        "Place ID": pid,
-                        "Locality searched": area
-                    })
-
-                if not next_token:
-                    break
-                # brief pause before using nextPageToken (Google recommends a small delay)
-                time.sleep(2)
-                try:
-                    data = text_search(query, page_token=next_token)
-                except requests.HTTPError as e:
-                    print(f"[WARN] Pagination error for '{query}': {e.response.text}")
-                    break
-                places = data.get("places", [])
-                next_token = data.get("nextPageToken")
-
-    df = pd.DataFrame(rows)
     # keep all rows (no de-dupe across specialties/areas beyond place id)
-    # if you want unique places only:
-    # df.drop_duplicates(subset=["Place ID"], inplace=True)
+    # if you want unique places only, drop repeated "Place ID" values here
+
+    if output_format == "xlsx":
+        if sheet_per_specialty and rows:
+            sheets: Dict[str, List[tuple]] = {}
+            for row in rows:
+                sheets.setdefault(row[1][:31], []).append(row)
+        else:
+            sheets = {"Sheet1": rows}
+        write_xlsx(output_path, sheets)
+        return output_path, len(rows)
 
-    df.to_excel(output_path, index=False)
+    # csv/parquet serialise far faster than any Excel writer; parquet needs pyarrow
+    df = pd.DataFrame.from_records(rows, columns=COLS)
+    if output_format == "csv":
+        df.to_csv(output_path, index=False)
+    else:
+        df.to_parquet(output_path, index=False, compression="zstd")
     return output_path, len(df)
 
 if __name__ == "__main__":
-    path, n = run()
+    # optional output path; its extension (.xlsx/.csv/.parquet) picks the format
+    path, n = run(*sys.argv[1:2])
     print(f"✅ Saved {n} rows to {path}")
@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+import unittest
+
+from cache_store import SeenStore
+
+
+class SeenStoreImportTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = SeenStore(os.path.join(self.dir.name, "seen.db"))
+        self.legacy = os.path.join(self.dir.name, ".cache_aundh.json")
+
+    def tearDown(self):
+        self.store._conn.close()
+        self.dir.cleanup()
+
+    def test_legacy_ids_are_imported(self):
+        with open(self.legacy, "w") as f:
+            json.dump(["a", "b"], f)
+        self.store.import_json("aundh", self.legacy)
+        self.assertEqual(self.store.ids("aundh"), {"a", "b"})
+        self.assertEqual(self.store.ids("baner"), set())
+
+    def test_file_is_read_once(self):
+        with open(self.legacy, "w") as f:
+            json.dump(["a"], f)
+        self.store.import_json("aundh", self.legacy)
+        with open(self.legacy, "w") as f:
+            json.dump(["a", "c"], f)
+        self.store.import_json("aundh", self.legacy)
+        self.assertEqual(self.store.ids("aundh"), {"a"})
+
+    def test_missing_file_is_skipped(self):
+        self.store.import_json("aundh", self.legacy)
+        self.assertEqual(self.store.ids("aundh"), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
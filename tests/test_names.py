@@ -0,0 +1,25 @@
+import unittest
+
+from names import split_doctor_and_clinic
+
+
+class SplitDoctorAndClinicTest(unittest.TestCase):
+    def test_full_name_and_clinic(self):
+        self.assertEqual(split_doctor_and_clinic("Dr. Anil Mehta - Skin Clinic"), ("Dr. Anil Mehta", "Skin Clinic"))
+
+    def test_single_letter_initials(self):
+        # regression: a lone initial as the first token used to drop the doctor name entirely
+        self.assertEqual(split_doctor_and_clinic("Dr A Mehta"), ("Dr A Mehta", "N/A"))
+        self.assertEqual(split_doctor_and_clinic("Dr. R Kulkarni | Ortho Clinic"), ("Dr. R Kulkarni", "Ortho Clinic"))
+        self.assertEqual(split_doctor_and_clinic("Dr. R K Joshi"), ("Dr. R K Joshi", "N/A"))
+
+    def test_accented_name(self):
+        self.assertEqual(split_doctor_and_clinic("Dr. Élodie Dubois"), ("Dr. Élodie Dubois", "N/A"))
+
+    def test_no_doctor(self):
+        self.assertEqual(split_doctor_and_clinic("Sahyadri Hospital"), ("N/A", "Sahyadri Hospital"))
+        self.assertEqual(split_doctor_and_clinic(""), ("N/A", "N/A"))
+
+
+if __name__ == "__main__":
+    unittest.main()